@@ -1,6 +1,6 @@
 use anyhow::{Context, Error};
 use chrono::{NaiveDate, NaiveDateTime, NaiveTime};
-use csv::Writer;
+use csv::WriterBuilder;
 use pdf::content::*;
 use pdf::file::File as pdfFile;
 use pdf_tools::ops_with_text_state;
@@ -8,7 +8,14 @@ use regex::Regex;
 use std::env::args;
 use std::fs;
 use std::fs::File;
-use std::str::FromStr;
+use std::sync::atomic::{AtomicUsize, Ordering};
+use std::sync::Mutex;
+use std::thread;
+
+// Date formats used in the statement tables and in the statement file names.
+const DATETIME_FMT: &str = "%d/%m/%Y %H:%M:%S";
+const DATE_FMT: &str = "%d/%m/%Y";
+const FILE_DATE_FMT: &str = "%d-%m-%Y";
 
 // Transaction row representation.
 #[derive(Debug, Clone)]
@@ -23,10 +30,8 @@ pub struct Transaction {
 impl Default for Transaction {
     fn default() -> Self {
         Transaction {
-            date: NaiveDateTime::new(
-                NaiveDate::from_ymd_opt(1970, 1, 1).unwrap(),
-                NaiveTime::from_hms_opt(0, 0, 0).unwrap(),
-            ),
+            // 1970-01-01 00:00:00
+            date: NaiveDateTime::default(),
             tx: "".to_owned(),
             points: 0,
             amount: 0.0,
@@ -34,6 +39,22 @@ impl Default for Transaction {
     }
 }
 
+// Parse a statement date cell in either %d/%m/%Y %H:%M:%S or %d/%m/%Y format.
+// The cell must already be trimmed; leading whitespace fails the pre-check below.
+fn parse_date(s: &str) -> Option<NaiveDateTime> {
+    // Most cells are descriptions, amounts or points; reject anything that can't
+    // be a date before handing it to the (comparatively slow) format parser.
+    if !s.starts_with(|c: char| c.is_ascii_digit()) || !s.contains('/') {
+        return None;
+    }
+
+    NaiveDateTime::parse_from_str(s, DATETIME_FMT)
+        .or_else(|_| {
+            NaiveDate::parse_from_str(s, DATE_FMT).map(|date| date.and_time(NaiveTime::MIN))
+        })
+        .ok()
+}
+
 // Parse the pdf and return a list of transactions.
 pub fn parse(path: String, _password: String) -> Result<Vec<Transaction>, Error> {
     let file = pdfFile::<Vec<u8>>::open_password(path.clone(), _password.as_bytes())
@@ -51,8 +72,10 @@ pub fn parse(path: String, _password: String) -> Result<Vec<Transaction>, Error>
                     Op::TextDraw { ref text } => {
                         let data = text.as_bytes();
                         if let Ok(s) = std::str::from_utf8(data) {
-                            return s.trim() != "Domestic Transactions"
-                                && s.trim() != "International Transactions";
+                            return !matches!(
+                                s.trim(),
+                                "Domestic Transactions" | "International Transactions"
+                            );
                         }
                         return true;
                     }
@@ -62,22 +85,7 @@ pub fn parse(path: String, _password: String) -> Result<Vec<Transaction>, Error>
                     Op::TextDraw { ref text } => {
                         let data = text.as_bytes();
                         if let Ok(s) = std::str::from_utf8(data) {
-                            let parsed_datetime =
-                                NaiveDateTime::parse_from_str(s.trim(), "%d/%m/%Y %H:%M:%S")
-                                    .or_else(|_| {
-                                        NaiveDate::parse_from_str(s.trim(), "%d/%m/%Y").map(
-                                            |date| {
-                                                NaiveDateTime::new(
-                                                    date,
-                                                    NaiveTime::from_hms_opt(0, 0, 0).unwrap(),
-                                                )
-                                            },
-                                        )
-                                    });
-                            match parsed_datetime {
-                                Ok(_) => return false,
-                                Err(_) => return true,
-                            }
+                            return parse_date(s.trim()).is_none();
                         }
                         return true;
                     }
@@ -99,12 +107,11 @@ pub fn parse(path: String, _password: String) -> Result<Vec<Transaction>, Error>
                             }
 
                             // try parsing %d/%m/%Y %H:%M:%S / %d/%m/%Y formats
-                            match NaiveDateTime::parse_from_str(d, "%d/%m/%Y %H:%M:%S") {
-                                Ok(dt) => {
-                                    // we have transaction here, clone it
+                            match parse_date(d) {
+                                Some(dt) => {
+                                    // we have transaction here, move it out
                                     if col > 0 {
-                                        members.push(transaction.clone());
-                                        transaction = Transaction::default();
+                                        members.push(std::mem::take(&mut transaction));
                                     }
 
                                     transaction.date = dt;
@@ -113,82 +120,64 @@ pub fn parse(path: String, _password: String) -> Result<Vec<Transaction>, Error>
                                     // reset col
                                     col = 0;
                                 }
-                                Err(_) => match NaiveDate::parse_from_str(d, "%d/%m/%Y") {
-                                    Ok(dt) => {
-                                        // we have transaction here, clone it
-                                        if col > 0 {
-                                            members.push(transaction.clone());
-                                            transaction = Transaction::default();
-                                        }
 
-                                        transaction.date = NaiveDateTime::new(
-                                            dt,
-                                            NaiveTime::from_hms_opt(0, 0, 0).unwrap(),
-                                        );
-                                        found_row = true;
-
-                                        // reset col
-                                        col = 0;
-                                    }
-
-                                    Err(_) => {
-                                        // Check for the descriptio, amount in the same row where the date was found.
-                                        if found_row {
-                                            // page end. push the transaction to the list and continue.
-                                            if amt_assigned {
-                                                if col > 3 {
-                                                    if let Ok(tx) = String::from_str(s.trim()) {
-                                                        if tx == "Cr" {
-                                                            transaction.amount *= -1.0;
-                                                        }
-                                                    }
-
-                                                    members.push(transaction.clone());
-                                                    found_row = false;
-                                                    transaction = Transaction::default();
-                                                    continue;
+                                None => {
+                                    // Check for the descriptio, amount in the same row where the date was found.
+                                    if found_row {
+                                        // page end. push the transaction to the list and continue.
+                                        if amt_assigned {
+                                            if col > 3 {
+                                                if d == "Cr" {
+                                                    transaction.amount = -transaction.amount;
                                                 }
+
+                                                members.push(std::mem::take(&mut transaction));
+                                                found_row = false;
+                                                continue;
                                             }
+                                        }
 
-                                            col += 1;
+                                        col += 1;
 
-                                            // Must be amount?
-                                            if col > 1 && d.contains(".") {
-                                                if let Ok(amt) = d.replace(",", "").parse::<f32>() {
-                                                    amt_assigned = true;
-                                                    transaction.amount = amt * -1.0;
-                                                    continue;
-                                                }
+                                        // Must be amount?
+                                        if col > 1 && d.contains('.') {
+                                            // only copy the cell when there are thousands separators to strip
+                                            let amt = if d.contains(',') {
+                                                d.replace(',', "").parse::<f32>()
+                                            } else {
+                                                d.parse::<f32>()
+                                            };
+                                            if let Ok(amt) = amt {
+                                                amt_assigned = true;
+                                                transaction.amount = -amt;
+                                                continue;
                                             }
+                                        }
 
-                                            // Must be description or debit/credit representation or reward points
-                                            if let Ok(tx) = String::from_str(s.trim()) {
-                                                // skip empty string
-                                                if tx == "" {
-                                                    continue;
-                                                }
-
-                                                // skip reward points
-                                                if let Ok(p) = tx.replace("- ", "-").parse::<i32>()
-                                                {
-                                                    transaction.points = p;
-                                                    continue;
-                                                }
+                                        // Must be description or debit/credit representation or reward points
+                                        // skip reward points, rewriting "- 12" as "-12" only when needed
+                                        let points = if d.contains("- ") {
+                                            d.replace("- ", "-").parse::<i32>()
+                                        } else {
+                                            d.parse::<i32>()
+                                        };
+                                        if let Ok(p) = points {
+                                            transaction.points = p;
+                                            continue;
+                                        }
 
-                                                // mark it as credit
-                                                if col > 2 && tx == "Cr" {
-                                                    transaction.amount *= -1.0;
-                                                    continue;
-                                                }
+                                        // mark it as credit
+                                        if col > 2 && d == "Cr" {
+                                            transaction.amount = -transaction.amount;
+                                            continue;
+                                        }
 
-                                                // assume transaction description to be next to date
-                                                if col == 1 {
-                                                    transaction.tx = tx;
-                                                }
-                                            }
+                                        // assume transaction description to be next to date
+                                        if col == 1 {
+                                            transaction.tx = d.to_owned();
                                         }
                                     }
-                                },
+                                }
                             }
                         }
                     }
@@ -219,26 +208,50 @@ fn main() -> Result<(), Error> {
         })
         .map(|path| path.to_string_lossy().to_string())
         .collect();
-    pdf_files.sort_by(|a, b| {
-        let a_date = NaiveDate::parse_from_str(&re.captures(a).unwrap()[1], "%d-%m-%Y").unwrap();
-        let b_date = NaiveDate::parse_from_str(&re.captures(b).unwrap()[1], "%d-%m-%Y").unwrap();
-        a_date.cmp(&b_date)
+    // The date key is extracted once per file rather than on every comparison.
+    pdf_files.sort_by_cached_key(|file| {
+        NaiveDate::parse_from_str(&re.captures(file).unwrap()[1], FILE_DATE_FMT).unwrap()
+    });
+
+    // Parse all the statement files. Statements are independent, so workers take
+    // the next file index from a shared counter and store the result in that file's
+    // slot, which keeps the date-sorted order.
+    let workers = thread::available_parallelism().map_or(1, |n| n.get());
+    let next = AtomicUsize::new(0);
+    let slots: Vec<Mutex<Option<Result<Vec<Transaction>, Error>>>> =
+        pdf_files.iter().map(|_| Mutex::new(None)).collect();
+    thread::scope(|scope| {
+        for _ in 0..workers.min(pdf_files.len()) {
+            scope.spawn(|| loop {
+                let i = next.fetch_add(1, Ordering::Relaxed);
+                if i >= pdf_files.len() {
+                    break;
+                }
+
+                let result = parse(pdf_files[i].clone(), _password.clone());
+                *slots[i].lock().unwrap() = Some(result);
+            });
+        }
     });
 
-    // Parse all the statement files.
     let mut members = Vec::new();
-    for file in pdf_files {
-        members.extend(parse(file, _password.clone()).context("Failed to parse statement")?)
+    for slot in slots {
+        let result = slot
+            .into_inner()
+            .unwrap()
+            .expect("statement was not parsed");
+        members.extend(result.context("Failed to parse statement")?)
     }
 
     // Create a csv file and write the contents of the transaction list
     let w = File::create(output).context("Unable to create output file")?;
-    let mut csv_writer = Writer::from_writer(w);
+    // Rows are small; use a larger buffer so the file is written in a few big chunks.
+    let mut csv_writer = WriterBuilder::new().buffer_capacity(1 << 16).from_writer(w);
 
     for member in members {
         let row = &[
             member.date.to_string(),
-            member.tx.clone(),
+            member.tx,
             member.points.to_string(),
             member.amount.to_string(),
         ];
@@ -248,5 +261,39 @@ fn main() -> Result<(), Error> {
             .context("Failed to write row")?
     }
 
+    // Flush explicitly; errors from the implicit flush on drop are discarded.
+    csv_writer.flush().context("Failed to flush output file")?;
+
     Ok(())
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn parse_date_formats() {
+        let dt = NaiveDate::from_ymd_opt(2023, 2, 1).unwrap();
+        assert_eq!(
+            parse_date("01/02/2023 10:11:12"),
+            Some(dt.and_hms_opt(10, 11, 12).unwrap())
+        );
+        assert_eq!(parse_date("01/02/2023"), Some(dt.and_time(NaiveTime::MIN)));
+        assert_eq!(parse_date("1/2/2023"), Some(dt.and_time(NaiveTime::MIN)));
+    }
+
+    #[test]
+    fn parse_date_rejects_other_cells() {
+        for cell in [
+            "",
+            "1,234.00",
+            "12.50",
+            "- 12",
+            "120",
+            "Cr",
+            "AMAZON PAY 01/02",
+        ] {
+            assert_eq!(parse_date(cell), None, "{:?}", cell);
+        }
+    }
+}